@@ -378,6 +378,15 @@ async def chat_endpoint(websocket: WebSocket):
         await websocket.close()
 
 
+@app.get("/ai/parse_stats")
+async def parse_stats_endpoint(current_user: dict = Depends(get_current_user)):
+    """
+    Structured-output parse statistics per prompt since server start.
+    - **Returns**: calls, parse failures, repair retries, exhausted budgets and their rates.
+    """
+    return {"retry_budget": PARSE_RETRY_BUDGET, "prompts": get_parse_stats()}
+
+
 @app.post("/ai/decide", response_model=DecisionResponse)
 async def decide_resell_or_recycle(data: DecisionInput, current_user: dict = Depends(get_current_user)):
     """
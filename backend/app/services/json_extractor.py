@@ -0,0 +1,260 @@
+import json
+
+OPENERS = {"{": dict, "[": list}
+CLOSERS = {"}": dict, "]": list}
+LITERALS = {"true": True, "false": False, "null": None}
+NUMBER_CHARS = set("+-0123456789.eE")
+WHITESPACE = set(" \t\r\n")
+
+
+class Frame:
+    """An object or array that is still open."""
+
+    def __init__(self, kind: type, start: int):
+        self.kind = kind
+        self.start = start
+        self.value = kind()
+        self.key = None
+        self.state = "first"  # first, key, colon, value, comma
+
+
+class JsonExtractor:
+    """
+    Single-pass extractor for JSON objects/arrays embedded in model output.
+
+    Text can be fed in chunks. Values are built bottom-up while scanning, so
+    extraction stays linear in the size of the output however deeply the JSON
+    is nested. When the text stops being valid JSON (prose such as
+    "[see notes: ..." or "{braces}"), the open candidate is dropped and
+    scanning resumes at that character, so a later value is still found.
+    Complete objects/arrays nested inside a dropped or unterminated candidate
+    are kept.
+
+    A quote in prose can make a candidate read the real payload's opening
+    bracket as string content (He said "{" then {"a": 1}). So when a
+    candidate fails, the text from the first bracket inside its last string
+    is scanned again. That text is the only part ever scanned twice.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._pos = 0
+        self._completed = []
+        self._pending = None
+        self._reset()
+
+    def feed(self, chunk: str) -> list:
+        """Scan a chunk of text and return the values completed within it."""
+        self._run(chunk)
+        return self._flush()
+
+    def close(self) -> list:
+        """Signal end of input and return values recovered from unterminated candidates."""
+        if self._mode in ("number", "literal"):
+            self._finish_scalar()
+            if self._pending:
+                # A number or literal failing at the very end still gets its rescan
+                pending, self._pending = self._pending, None
+                self._run(pending)
+        self._discard()
+        return self._flush()
+
+    def _run(self, text: str):
+        segments = [iter(text)]
+        while segments:
+            char = next(segments[-1], None)
+            if char is None:
+                segments.pop()
+                continue
+            self._step(char)
+            if self._pending:
+                segments.append(iter(self._pending))
+                self._pending = None
+
+    def _step(self, char: str):
+        self._pos += 1
+        if self._rescan is not None:
+            self._rescan.append(char)
+
+        if self._mode == "string":
+            if char < " ":
+                # Raw control characters can't appear in a JSON string
+                self._fail(char)
+                return
+            self._token.append(char)
+            if char == "\\":
+                self._mode = "escape"
+            elif char == '"':
+                self._finish_string()
+            elif char in OPENERS and self._rescan is None:
+                self._rescan = [char]
+            return
+
+        if self._mode == "escape":
+            self._token.append(char)
+            self._mode = "string"
+            return
+
+        if self._mode == "number":
+            if char in NUMBER_CHARS:
+                self._token.append(char)
+                return
+            self._finish_scalar()
+        elif self._mode == "literal":
+            if char.isalpha():
+                self._token.append(char)
+                return
+            self._finish_scalar()
+
+        if not self._pending:
+            self._scan(char)
+
+    def _scan(self, char: str):
+        if self._mode == "prose":
+            if char in OPENERS:
+                self._frames.append(Frame(OPENERS[char], self._pos))
+                self._mode = "json"
+            return
+
+        if char in WHITESPACE:
+            return
+        frame = self._frames[-1]
+
+        if char in OPENERS or char in NUMBER_CHARS or char.isalpha() or char == '"':
+            if char == '"' and frame.state in ("first", "key") and frame.kind is dict:
+                self._start_string()
+            elif not self._expects_value(frame):
+                self._fail(char)
+            elif char in OPENERS:
+                self._frames.append(Frame(OPENERS[char], self._pos))
+            elif char == '"':
+                self._start_string()
+            elif char in NUMBER_CHARS:
+                self._start_token("number", char)
+            else:
+                self._start_token("literal", char)
+        elif char in CLOSERS:
+            if CLOSERS[char] is not frame.kind or frame.state not in ("first", "comma"):
+                self._fail(char)
+            else:
+                self._frames.pop()
+                self._add(frame.value, frame.start)
+        elif char == ":" and frame.state == "colon":
+            frame.state = "value"
+        elif char == "," and frame.state == "comma":
+            frame.state = "key" if frame.kind is dict else "value"
+        else:
+            self._fail(char)
+
+    def _expects_value(self, frame: Frame) -> bool:
+        return frame.state == "value" or (frame.kind is list and frame.state == "first")
+
+    def _start_string(self):
+        self._start_token("string")
+        self._rescan = None  # Only the candidate's latest string is worth rescanning
+
+    def _start_token(self, mode: str, first: str = ""):
+        self._mode = mode
+        self._token = [first] if first else []
+
+    def _finish_string(self):
+        self._mode = "json"
+        try:
+            value = json.loads('"' + "".join(self._token))
+        except json.JSONDecodeError:
+            self._fail(None)
+            return
+        frame = self._frames[-1]
+        if frame.kind is dict and frame.state in ("first", "key"):
+            frame.key = value
+            frame.state = "colon"
+        else:
+            self._add(value)
+
+    def _finish_scalar(self):
+        token = "".join(self._token)
+        self._mode = "json"
+        if token in LITERALS:
+            self._add(LITERALS[token])
+            return
+        try:
+            value = json.loads(token)
+        except json.JSONDecodeError:
+            value = None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self._add(value)
+        else:
+            self._fail(None)
+
+    def _add(self, value, start: int = None):
+        """Attach a completed value to the enclosing frame, or emit it at top level."""
+        if not self._frames:
+            self._emit(value)
+            self._reset()
+            return
+
+        if start is not None:
+            self._nested.append((start, value))
+        frame = self._frames[-1]
+        if frame.kind is dict:
+            frame.value[frame.key] = value
+        else:
+            frame.value.append(value)
+        frame.state = "comma"
+
+    def _fail(self, char):
+        """
+        Drop the open candidate. Rescan from the first bracket in its last string
+        if there was one (that text already ends with `char`), otherwise rescan
+        just the offending character as prose.
+        """
+        rescan = self._rescan
+        self._discard()
+        if rescan:
+            self._pending = "".join(rescan)
+        elif char is not None:
+            self._scan(char)
+
+    def _discard(self):
+        # Keep the outermost complete containers found inside the dropped candidate
+        kept, outer_start = [], None
+        for start, value in reversed(self._nested):
+            if outer_start is None or start < outer_start:
+                kept.append(value)
+                outer_start = start
+        for value in reversed(kept):
+            self._emit(value)
+        self._reset()
+
+    def _emit(self, value):
+        self.values.append(value)
+        self._completed.append(value)
+
+    def _reset(self):
+        self._frames = []
+        self._nested = []
+        self._token = []
+        self._rescan = None
+        self._mode = "prose"
+
+    def _flush(self) -> list:
+        completed, self._completed = self._completed, []
+        return completed
+
+
+def extract_json(text: str, kind: type = dict):
+    """Return the first JSON value of the given kind (dict or list) found in text, or None."""
+    for value in extract_all_json(text):
+        if isinstance(value, kind):
+            return value
+    return None
+
+
+def extract_all_json(text: str) -> list:
+    """Return every JSON object/array found in text, in the order they were found."""
+    if not text:
+        return []
+    extractor = JsonExtractor()
+    extractor.feed(text)
+    extractor.close()
+    return extractor.values
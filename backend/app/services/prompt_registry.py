@@ -0,0 +1,38 @@
+import textwrap
+
+from google.genai import types
+
+
+class PromptTemplate:
+    """A static system prompt, built once at import time and identified by name and version."""
+
+    def __init__(self, name: str, version: int, text: str):
+        self.name = name
+        self.version = version
+        self.text = textwrap.dedent(text).strip()
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}-v{self.version}"
+
+
+class PromptRegistry:
+    """
+    Holds the static prompts used by the AI service. Each prompt is sent as the
+    request's system instruction, with only the per-request values in contents.
+    """
+
+    def __init__(self):
+        self.templates = {}
+
+    def register(self, name: str, version: int, text: str) -> PromptTemplate:
+        template = PromptTemplate(name, version, text)
+        self.templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self.templates[name]
+
+    def config(self, name: str, **kwargs) -> types.GenerateContentConfig:
+        """Build a GenerateContentConfig with the prompt as its system instruction."""
+        return types.GenerateContentConfig(system_instruction=self.get(name).text, **kwargs)
@@ -0,0 +1,63 @@
+from functools import lru_cache
+from typing import List, Literal
+
+from pydantic import BaseModel, TypeAdapter
+
+
+GenericTag = Literal[
+    "Mobile Devices", "Computers and Laptops", "Computer Accessories", "Networking Equipment",
+    "Audio and Video Devices", "Storage Devices", "Batteries and Power Supplies", "Home Appliances",
+    "Gaming and Entertainment", "Office Electronics", "Industrial and Medical Equipment", "Car Electronics",
+    "IGN",
+]
+
+
+class DecisionOutput(BaseModel):
+    """Model output for the recycle/resell decision, the `decision` of DecisionResponse."""
+    decision: Literal["resell", "recycle", "IGN"]
+
+class EwasteOutput(BaseModel):
+    """Model output for image categorization."""
+    category: str
+    desc: str
+    search_tags: List[str]
+    generic_tag: GenericTag
+
+class QuestionsOutput(BaseModel):
+    """Model output for question generation, same shape as QuestionGetterResponse."""
+    questions: List[str]
+
+class GuidePointer(BaseModel):
+    heading: str
+    details: str
+
+class GuideOutput(BaseModel):
+    """Model output for recycle/resell guidance."""
+    initials: str
+    pointers: List[GuidePointer]
+
+
+@lru_cache(maxsize=None)
+def gemini_schema(schema) -> dict:
+    """
+    Response schema for `schema` in the plain form Gemini accepts: $refs inlined,
+    titles and docstring descriptions dropped, types upper-cased. google-genai
+    only converts flat pydantic models itself, not nested models or bare lists.
+    """
+    json_schema = TypeAdapter(schema).json_schema()
+    defs = json_schema.pop("$defs", {})
+
+    def convert(node):
+        if isinstance(node, list):
+            return [convert(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if "$ref" in node:
+            return convert(defs[node["$ref"].rsplit("/", 1)[-1]])
+        return {
+            key: value.upper() if key == "type" else convert(value)
+            for key, value in node.items()
+            if not (key in ("title", "description") and isinstance(value, str))
+        }
+
+    return convert(json_schema)
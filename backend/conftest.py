@@ -0,0 +1,6 @@
+# Lets plain `pytest` import the `app` package from backend/ and gives the
+# AI service the settings it reads at import time.
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("USE_MODEL", "gemini-2.0-flash")
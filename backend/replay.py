@@ -0,0 +1,281 @@
+"""
+Replay captured traffic from logs.json against a running instance.
+
+    python replay.py --start 2025-03-01T10:00:00 --end 2025-03-01T11:00:00 --target http://localhost:8000
+    python replay.py --start ... --end ... --speed 4          # 4x faster than recorded
+    python replay.py --start ... --end ... --speed 0          # as fast as possible
+    python replay.py --start ... --end ... --in-process --stub-upstreams
+
+Authorization headers are stripped from every request unless --token is given,
+in which case they are replaced with "Bearer <token>". Prints latency
+percentiles and error rates per endpoint once the replay finishes.
+
+With speed > 0 every request is sent at its scheduled time, however many are
+already in flight; the report includes how late requests actually started, so
+a client that can't keep up shows as start lag instead of shifted latencies.
+--concurrency only limits max-speed (--speed 0) replays.
+
+In-process replays never post to the Google Sheet webhook, and the app's own
+request log goes to --app-log instead of logs.json. Importing app.main still
+initialises firebase_admin, so SERVICE_ACC_STORED_AT must point at a directory
+holding service-acc.json. GEMINI_API_KEY and USE_MODEL are also needed, unless
+--stub-upstreams is given, in which case placeholders are set.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo
+
+import httpx
+
+IST = ZoneInfo("Asia/Kolkata")
+LOG_FILE = "logs.json"
+APP_LOG_FILE = "replay_app.log"
+
+# Headers that describe the original connection rather than the request itself
+DROPPED_HEADERS = {"host", "content-length", "connection", "authorization", "cookie", "transfer-encoding"}
+
+# Canned model output per registered prompt, used by --stub-upstreams
+STUB_RESPONSES = {
+    "product_description": "This product is \n 1) stubbed \n 2) in good condition",
+    "blog_tags": "[\"stub\", \"replay\"]",
+    "ewaste_classifier": "{\"category\": \"Laptop\", \"desc\": \"stub\", \"search_tags\": [\"stub\"], \"generic_tag\": \"Computers and Laptops\"}",
+    "questions": "{\"questions\": [\"Does it power on?\", \"Is the screen intact?\", \"How old is it?\", \"Is the battery healthy?\"]}",
+    "decision": "{\"decision\": \"resell\"}",
+    "recycle_guide": "{\"initials\": \"stub\", \"pointers\": [{\"heading\": \"Recycling\", \"details\": \"stub\"}]}",
+    "resell_guide": "{\"initials\": \"stub\", \"pointers\": [{\"heading\": \"Reuse\", \"details\": \"stub\"}]}",
+}
+
+
+def parse_time(value: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value).replace(tzinfo=IST)
+
+
+def load_records(path: str, start: datetime.datetime, end: datetime.datetime) -> list:
+    """Read captured requests inside [start, end], ordered by time."""
+    records = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line.strip())
+            except json.JSONDecodeError:
+                continue  # Skip corrupt entries and plain log lines
+            if not isinstance(entry, dict) or not {"time", "method", "url"} <= entry.keys():
+                continue
+            entry_time = parse_time(entry["time"])
+            if start <= entry_time <= end:
+                entry["_time"] = entry_time
+                records.append(entry)
+    records.sort(key=lambda r: r["_time"])
+    return records
+
+
+def build_request(record: dict, token: str | None) -> dict:
+    url = urlsplit(record["url"])
+    path = url.path + (f"?{url.query}" if url.query else "")
+    headers = {k: v for k, v in (record.get("headers") or {}).items() if k.lower() not in DROPPED_HEADERS}
+    if token:
+        headers["authorization"] = f"Bearer {token}"
+    body = record.get("body")
+    return {
+        "method": record["method"],
+        "path": path,
+        "endpoint": f"{record['method']} {url.path}",
+        "headers": headers,
+        "content": body.encode("utf-8") if body else None,
+    }
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+async def send(client: httpx.AsyncClient, request: dict, results: dict):
+    started = time.perf_counter()
+    try:
+        response = await client.request(
+            request["method"], request["path"], headers=request["headers"], content=request["content"]
+        )
+        failed = response.status_code >= 400
+    except httpx.HTTPError:
+        failed = True
+    elapsed = (time.perf_counter() - started) * 1000
+    results[request["endpoint"]].append((elapsed, failed))
+
+
+async def replay(records: list, client: httpx.AsyncClient, speed: float, concurrency: int, token: str | None) -> tuple:
+    """
+    Send every record through the client and return (results, start lags in ms).
+
+    With speed > 0 requests keep their recorded spacing divided by speed and are
+    not limited in number, so the recorded load shape is kept; the lag between
+    each request's scheduled and actual start is measured. With speed == 0 they
+    are sent back to back, at most `concurrency` in flight, and no lag is recorded.
+    """
+    results = defaultdict(list)
+    lags = []
+
+    async def paced(record: dict, delay: float):
+        await asyncio.sleep(delay)
+        lags.append((time.perf_counter() - started - delay) * 1000)
+        await send(client, build_request(record, token), results)
+
+    async def limited(record: dict):
+        async with semaphore:
+            await send(client, build_request(record, token), results)
+
+    origin = records[0]["_time"] if records else None
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    tasks = []
+    for record in records:
+        if speed > 0:
+            delay = (record["_time"] - origin).total_seconds() / speed
+            tasks.append(asyncio.create_task(paced(record, delay)))
+        else:
+            tasks.append(asyncio.create_task(limited(record)))
+    await asyncio.gather(*tasks)
+    return results, lags
+
+
+def summarize(results: dict) -> list:
+    rows = []
+    for endpoint, samples in sorted(results.items()):
+        latencies = sorted(elapsed for elapsed, _ in samples)
+        errors = sum(1 for _, failed in samples if failed)
+        rows.append({
+            "endpoint": endpoint,
+            "count": len(samples),
+            "error_rate": errors / len(samples),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p90_ms": round(percentile(latencies, 90), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(latencies[-1], 1),
+        })
+    return rows
+
+
+def summarize_lag(lags: list) -> dict | None:
+    if not lags:
+        return None
+    lags = sorted(lags)
+    return {
+        "p50_ms": round(percentile(lags, 50), 1),
+        "p99_ms": round(percentile(lags, 99), 1),
+        "max_ms": round(lags[-1], 1),
+    }
+
+
+def print_report(rows: list):
+    print(f"{'endpoint':<45}{'count':>7}{'errors':>9}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for row in rows:
+        print(
+            f"{row['endpoint']:<45}{row['count']:>7}{row['error_rate']:>9.1%}"
+            f"{row['p50_ms']:>10}{row['p90_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}"
+        )
+
+
+def in_process_transport(stub_upstreams: bool, app_log: str) -> httpx.ASGITransport:
+    """Serve requests from the app in this process, authentication bypassed."""
+    # Claim the root logger before app.main is imported so its basicConfig
+    # is a no-op and replayed requests don't land in the captured logs.json
+    logging.basicConfig(filename=app_log, level=logging.INFO, format="%(message)s", force=True)
+
+    if stub_upstreams:
+        # ai_service refuses to import without these; no real model is called
+        os.environ.setdefault("GEMINI_API_KEY", "replay-stub")
+        os.environ.setdefault("USE_MODEL", "replay-stub")
+
+    from app import main as app_main
+    from app.services import ai_service
+
+    async def skip_sheet(payload: dict):
+        pass
+
+    app_main.app.dependency_overrides[app_main.get_current_user] = lambda: {"name": "replay", "sub": "replay_user"}
+    app_main.send_to_google_sheet = skip_sheet
+
+    if stub_upstreams:
+        class StubResponse:
+            def __init__(self, text):
+                self.text = text
+
+        ai_service.generate_with_prompt = lambda prompt_name, model_name, contents, **config_kwargs: StubResponse(STUB_RESPONSES[prompt_name])
+
+    return httpx.ASGITransport(app=app_main.app)
+
+
+async def main(args):
+    records = load_records(args.log_file, parse_time(args.start), parse_time(args.end))
+    if not records:
+        print("No captured requests in the given window")
+        return
+
+    if args.in_process:
+        transport = in_process_transport(args.stub_upstreams, args.app_log)
+        client = httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.target, timeout=args.timeout)
+
+    print(f"Replaying {len(records)} requests at {'max speed' if args.speed == 0 else f'{args.speed}x'}")
+    async with client:
+        started = time.perf_counter()
+        results, lags = await replay(records, client, args.speed, args.concurrency, args.token)
+        wall = time.perf_counter() - started
+
+    rows = summarize(results)
+    lag = summarize_lag(lags)
+    print_report(rows)
+    print(f"Finished in {wall:.1f}s")
+    if lag:
+        print(f"Start lag behind schedule: p50 {lag['p50_ms']}ms, p99 {lag['p99_ms']}ms, max {lag['max_ms']}ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"wall_seconds": wall, "start_lag": lag, "endpoints": rows}, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay captured requests from logs.json")
+    parser.add_argument("--start", required=True, help="Start time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    parser.add_argument("--end", required=True, help="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    parser.add_argument("--log-file", default=LOG_FILE)
+    parser.add_argument("--target", default="http://localhost:8000", help="Base URL of the instance to replay against")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier, 0 for max speed")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight with --speed 0")
+    parser.add_argument("--token", help="Token to send instead of the recorded one (stripped otherwise)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--in-process", action="store_true", help="Replay against app.main in this process")
+    parser.add_argument("--app-log", default=APP_LOG_FILE, help="With --in-process, where the app's own logs go")
+    parser.add_argument("--stub-upstreams", action="store_true", help="With --in-process, answer model calls with canned output")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+    if args.stub_upstreams and not args.in_process:
+        parser.error("--stub-upstreams requires --in-process")
+    if os.path.abspath(args.app_log) == os.path.abspath(args.log_file):
+        parser.error("--app-log must differ from --log-file")
+    if args.speed < 0:
+        parser.error("--speed must be >= 0")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be >= 1")
+    try:
+        start, end = parse_time(args.start), parse_time(args.end)
+    except ValueError as e:
+        parser.error(f"--start/--end must be ISO timestamps: {e}")
+    if start > end:
+        parser.error("--start must not be after --end")
+    if args.in_process and not os.environ.get("SERVICE_ACC_STORED_AT"):
+        parser.error("--in-process needs SERVICE_ACC_STORED_AT (app.main initialises firebase_admin on import)")
+    if args.in_process and not args.stub_upstreams and not os.environ.get("GEMINI_API_KEY"):
+        parser.error("--in-process without --stub-upstreams needs GEMINI_API_KEY")
+    asyncio.run(main(args))
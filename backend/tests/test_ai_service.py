@@ -0,0 +1,123 @@
+from collections import Counter, defaultdict
+
+import pytest
+
+from app.services import ai_service
+from app.services.schemas import DecisionOutput, QuestionsOutput
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Stands in for generate_with_prompt, answering each prompt from a queue of replies."""
+
+    def __init__(self, **replies):
+        self.replies = {name: list(texts) for name, texts in replies.items()}
+        self.calls = []
+
+    def __call__(self, prompt_name, model_name, contents, **config_kwargs):
+        self.calls.append((prompt_name, contents, config_kwargs))
+        return StubResponse(self.replies[prompt_name].pop(0))
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(ai_service, "parse_stats", defaultdict(Counter))
+    monkeypatch.setattr(ai_service, "PARSE_RETRY_BUDGET", 1)
+
+
+def stub(monkeypatch, **replies):
+    model = StubModel(**replies)
+    monkeypatch.setattr(ai_service, "generate_with_prompt", model)
+    return model
+
+
+def test_valid_output_is_returned_without_retry(monkeypatch):
+    model = stub(monkeypatch, questions=['{"questions": ["Does it power on?"]}'])
+    result = ai_service.generate_structured("questions", "m", "The product is a laptop.", QuestionsOutput)
+    assert result.questions == ["Does it power on?"]
+    assert len(model.calls) == 1
+    _, _, config = model.calls[0]
+    assert config["response_mime_type"] == "application/json"
+    assert config["response_schema"]["properties"]["questions"]["type"] == "ARRAY"
+    assert ai_service.get_parse_stats()["questions"] == {
+        "calls": 1, "parse_failures": 0, "retries": 0, "exhausted": 0,
+        "parse_failure_rate": 0.0, "exhausted_rate": 0.0,
+    }
+
+
+def test_json_wrapped_in_prose_is_extracted_without_retry(monkeypatch):
+    model = stub(monkeypatch, decision=['For example [{"decision": "maybe"}, oops] so: {"decision": "recycle"}'])
+    result = ai_service.generate_structured("decision", "m", ["ctx"], DecisionOutput)
+    assert result.decision == "recycle"
+    assert len(model.calls) == 1
+    assert ai_service.get_parse_stats()["decision"]["parse_failures"] == 0
+
+
+def test_invalid_output_is_repaired_within_budget(monkeypatch):
+    model = stub(monkeypatch, decision=["Recycle.", '{"decision": "recycle"}'])
+    result = ai_service.generate_structured("decision", "m", ["ctx"], DecisionOutput)
+    assert result.decision == "recycle"
+
+    first_contents, repair_contents = model.calls[0][1], model.calls[1][1]
+    assert first_contents == ["ctx"]
+    assert repair_contents[0] == "ctx"
+    assert "Your previous reply was: Recycle." in repair_contents[1]
+    assert ai_service.get_parse_stats()["decision"] == {
+        "calls": 1, "parse_failures": 1, "retries": 1, "exhausted": 0,
+        "parse_failure_rate": 0.5, "exhausted_rate": 0.0,
+    }
+
+
+@pytest.mark.parametrize("budget", [0, 1, 3])
+def test_retries_stop_at_budget(monkeypatch, budget):
+    monkeypatch.setattr(ai_service, "PARSE_RETRY_BUDGET", budget)
+    model = stub(monkeypatch, decision=["nope"] * 10)
+    assert ai_service.generate_structured("decision", "m", "ctx", DecisionOutput) is None
+    assert len(model.calls) == budget + 1
+    stats = ai_service.get_parse_stats()["decision"]
+    assert (stats["calls"], stats["retries"], stats["parse_failures"], stats["exhausted"]) == (1, budget, budget + 1, 1)
+    assert stats["parse_failure_rate"] == 1.0
+    assert stats["exhausted_rate"] == 1.0
+
+
+def test_stats_have_the_same_keys_for_every_prompt(monkeypatch):
+    stub(monkeypatch, questions=['{"questions": ["q"]}'], decision=["nope", "nope"])
+    ai_service.generate_structured("questions", "m", "ctx", QuestionsOutput)
+    ai_service.generate_structured("decision", "m", "ctx", DecisionOutput)
+    stats = ai_service.get_parse_stats()
+    assert stats["questions"].keys() == stats["decision"].keys()
+
+
+def test_decide_returns_guide(monkeypatch):
+    stub(
+        monkeypatch,
+        decision=['{"decision": "resell"}'],
+        resell_guide=['{"initials": "Sell it", "pointers": [{"heading": "Reuse", "details": "List it online"}]}'],
+    )
+    result = ai_service.decide_recycle_or_resell("Laptop", "i7, 16GB", "works fine")
+    assert result == {"r": "resell", "g": {"initials": "Sell it", "pointers": {"headings": ["Reuse"], "description": ["List it online"]}}}
+
+
+def test_decide_falls_back_to_ign_guide_when_guide_is_unparseable(monkeypatch):
+    stub(monkeypatch, decision=['{"decision": "recycle"}'], recycle_guide=["not json", "still not json"])
+    result = ai_service.decide_recycle_or_resell("Laptop", "broken", "screen cracked")
+    assert result["r"] == "recycle"
+    assert result["g"] == {"initials": "IGN", "pointers": {"headings": ["IGN"], "description": ["IGN"]}}
+    assert ai_service.get_parse_stats()["recycle_guide"]["exhausted"] == 1
+
+
+def test_decide_is_ign_when_decision_is_unparseable(monkeypatch):
+    model = stub(monkeypatch, decision=["Recycle.", "Definitely recycle"])
+    result = ai_service.decide_recycle_or_resell("Laptop", "broken", "screen cracked")
+    assert result["r"] == "IGN"
+    assert [call[0] for call in model.calls] == ["decision", "decision"]
+
+
+def test_tags_and_questions_fall_back_when_exhausted(monkeypatch):
+    stub(monkeypatch, blog_tags=["tag1, tag2", "tag1, tag2"], questions=["IGN", "IGN"])
+    assert ai_service.generate_tags("A blog about batteries") == []
+    assert ai_service.give_ques("Toaster") == {"questions": ["IGN"]}
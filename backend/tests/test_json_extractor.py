@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+from app.services.json_extractor import JsonExtractor, extract_all_json, extract_json
+
+
+def feed_in_chunks(text, size):
+    extractor = JsonExtractor()
+    for i in range(0, len(text), size):
+        extractor.feed(text[i:i + size])
+    extractor.close()
+    return extractor.values
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('Sure! ```json\n{"a": 1}\n``` hope that helps', {"a": 1}),
+    ('{"a": {"b": {"c": {"d": [1, {"e": null}]}}}}', {"a": {"b": {"c": {"d": [1, {"e": None}]}}}}),
+    ('{"braces": "}{][", "quote": "say \\"hi\\""}', {"braces": "}{][", "quote": 'say "hi"'}),
+    ('{"path": "C:\\\\temp", "uni": "\\u00e9"}', {"path": "C:\\temp", "uni": "é"}),
+    ('{"n": -1.5e3, "t": true, "f": false, "z": 0}', {"n": -1500.0, "t": True, "f": False, "z": 0}),
+    ('{ "spaced" :\n [ 1 , 2 ] }', {"spaced": [1, 2]}),
+    ('{}', {}),
+])
+def test_extracts_valid_objects(text, expected):
+    assert extract_json(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    'Sure [see notes: {"a": 1}',
+    'Use {braces "like this} and {"a": 1}',
+    "don't {worry} about it, here: {\"a\": 1}",
+    '{{"a": 1}',
+    '{"a": oops} then {"a": 1}',
+    '{"a": 01} then {"a": 1}',
+    '[1, 2,] {"a": 1}',
+    '{"a": "unterminated\n} {"a": 1}',
+    'He said "{" then {"a": 1}',
+    'x: "[" {"a": 1}',
+    'quote "{" and "[" then {"a": 1}',
+    'list ["{", oops] {"a": 1}',
+])
+def test_skips_prose_noise_before_value(text):
+    assert extract_json(text) == {"a": 1}
+
+
+def test_keeps_complete_value_inside_unterminated_candidate():
+    assert extract_json('[ {"a": 1}, {"a": 2') == {"a": 1}
+    assert extract_json('{"outer": {"a": 1}, "broken": tru') == {"a": 1}
+
+
+def test_keeps_outermost_nested_value_of_dropped_candidate():
+    assert extract_json('[{"a": {"b": 1}} oops') == {"a": {"b": 1}}
+
+
+def test_extract_all_returns_every_value_in_order():
+    text = 'For example [{"decision": "maybe"}, oops] so: {"decision": "recycle"}'
+    assert extract_all_json(text) == [{"decision": "maybe"}, {"decision": "recycle"}]
+    assert extract_all_json("") == []
+
+
+def test_filters_by_kind():
+    text = 'notes {"a": 1} then ["x", "y"]'
+    assert extract_json(text) == {"a": 1}
+    assert extract_json(text, list) == ["x", "y"]
+
+
+@pytest.mark.parametrize("text", ["", "no json here", '{"a": 1', "[1, 2", '{"a" 1}'])
+def test_returns_none_without_complete_value(text):
+    assert extract_json(text) is None
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_chunked_feed_matches_single_feed(size):
+    text = 'Here: {"q": ["a\\"b", "c\\\\"], "n": 12.5e-1, "ok": true} and [null, {"x": false}]'
+    assert feed_in_chunks(text, size) == feed_in_chunks(text, len(text))
+    assert feed_in_chunks(text, size) == [{"q": ['a"b', "c\\"], "n": 1.25, "ok": True}, [None, {"x": False}]]
+
+
+def test_feed_returns_values_as_they_complete():
+    extractor = JsonExtractor()
+    assert extractor.feed('{"q": ["a') == []
+    assert extractor.feed('", "b"]} and {"r"') == [{"q": ["a", "b"]}]
+    assert extractor.feed(": 1}") == [{"r": 1}]
+    assert extractor.close() == []
+
+
+def test_close_flushes_nested_values_of_open_candidate():
+    extractor = JsonExtractor()
+    assert extractor.feed('[{"a": 1}, ') == []
+    assert extractor.close() == [{"a": 1}]
+
+
+@pytest.mark.parametrize("text", [
+    "[" * 200000,
+    "{" * 200000,
+    '{"a": ' * 100000,
+    '"{' * 100000,
+    '{"{' * 100000,
+    "[" * 100000 + "]" * 100000,
+], ids=["open-arrays", "open-objects", "open-keys", "quoted-braces", "quoted-keys", "deep-array"])
+def test_pathological_input_stays_linear(text):
+    started = time.perf_counter()
+    assert extract_json(text + ' {"a": 1}') == {"a": 1}
+    assert time.perf_counter() - started < 2
@@ -0,0 +1,28 @@
+from app.services.prompt_registry import PromptRegistry
+
+
+def test_prompt_is_sent_as_system_instruction():
+    prompts = PromptRegistry()
+    prompts.register("tags", 1, "Extract tags.")
+    config = prompts.config("tags", response_mime_type="application/json")
+    assert config.system_instruction == "Extract tags."
+    assert config.response_mime_type == "application/json"
+    assert config.cached_content is None
+
+
+def test_prompt_text_is_dedented_once_at_registration():
+    prompts = PromptRegistry()
+    template = prompts.register("chat", 1, """
+        You are a helpful assistant.
+            1. Ask questions.
+    """)
+    assert template.text == "You are a helpful assistant.\n    1. Ask questions."
+    assert prompts.get("chat") is template
+
+
+def test_new_version_replaces_prompt():
+    prompts = PromptRegistry()
+    prompts.register("tags", 1, "Extract tags.")
+    prompts.register("tags", 2, "Extract tags as JSON.")
+    assert prompts.get("tags").key == "tags-v2"
+    assert prompts.config("tags").system_instruction == "Extract tags as JSON."
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import replay
+
+
+def record(time, url="http://api.example.com/ai/questions?q=1", **extra):
+    return {"time": time, "method": "POST", "url": url, **extra}
+
+
+def test_build_request_strips_recorded_auth():
+    request = replay.build_request(
+        record(
+            "2025-03-01T10:00:00",
+            headers={"Authorization": "Bearer real", "Cookie": "s=1", "Host": "api", "Content-Type": "application/json"},
+            body='{"a": 1}',
+        ),
+        token=None,
+    )
+    assert request["headers"] == {"Content-Type": "application/json"}
+    assert request["path"] == "/ai/questions?q=1"
+    assert request["endpoint"] == "POST /ai/questions"
+    assert request["content"] == b'{"a": 1}'
+
+
+def test_build_request_replaces_auth_with_token():
+    request = replay.build_request(record("2025-03-01T10:00:00", headers={"authorization": "Bearer real"}), token="t0k")
+    assert request["headers"] == {"authorization": "Bearer t0k"}
+    assert request["content"] is None
+
+
+def test_load_records_keeps_window_and_skips_non_json_lines(tmp_path):
+    log = tmp_path / "logs.json"
+    log.write_text("\n".join([
+        json.dumps(record("2025-03-01T10:30:00", url="http://x/late")),
+        "INFO: plain log line",
+        '{"time": "2025-03-01T10:10:00", "method": "GET"',  # truncated entry
+        json.dumps({"time": "2025-03-01T10:15:00", "message": "not a request"}),
+        json.dumps(record("2025-03-01T09:59:59", url="http://x/before")),
+        json.dumps(record("2025-03-01T10:00:00", url="http://x/first")),
+        json.dumps(record("2025-03-01T11:00:01", url="http://x/after")),
+        json.dumps(record("2025-03-01T11:00:00", url="http://x/last")),
+        "",
+    ]))
+    records = replay.load_records(str(log), replay.parse_time("2025-03-01T10:00:00"), replay.parse_time("2025-03-01T11:00:00"))
+    assert [r["url"] for r in records] == ["http://x/first", "http://x/late", "http://x/last"]
+
+
+@pytest.mark.parametrize("pct, expected", [(0, 1), (50, 5), (90, 9), (99, 10), (100, 10)])
+def test_percentile_nearest_rank(pct, expected):
+    assert replay.percentile(list(range(1, 11)), pct) == expected
+
+
+def test_percentile_of_nothing():
+    assert replay.percentile([], 50) == 0.0
+
+
+def test_summarize():
+    rows = replay.summarize({
+        "GET /b": [(10.0, False)],
+        "POST /a": [(30.0, True), (10.0, False), (20.0, False), (40.0, False)],
+    })
+    assert rows == [
+        {"endpoint": "GET /b", "count": 1, "error_rate": 0.0, "p50_ms": 10.0, "p90_ms": 10.0, "p99_ms": 10.0, "max_ms": 10.0},
+        {"endpoint": "POST /a", "count": 4, "error_rate": 0.25, "p50_ms": 20.0, "p90_ms": 40.0, "p99_ms": 40.0, "max_ms": 40.0},
+    ]
+
+
+def run_replay(speed, concurrency, count=4, handler_delay=0.2):
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(handler_delay)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    records = [record("2025-03-01T10:00:00") for _ in range(count)]
+    for entry in records:
+        entry["_time"] = replay.parse_time(entry["time"])
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://replay") as client:
+            return await replay.replay(records, client, speed, concurrency, None)
+
+    results, lags = asyncio.run(go())
+    return results, lags, peak
+
+
+def test_paced_replay_is_not_limited_by_concurrency():
+    results, lags, peak = run_replay(speed=1, concurrency=1)
+    assert peak == 4
+    assert len(results["POST /ai/questions"]) == 4
+    assert len(lags) == 4 and max(lags) < 150
+
+
+def test_max_speed_replay_respects_concurrency():
+    results, lags, peak = run_replay(speed=0, concurrency=2)
+    assert peak == 2
+    assert len(results["POST /ai/questions"]) == 4
+    assert lags == []
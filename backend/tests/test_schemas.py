@@ -0,0 +1,49 @@
+from typing import List
+
+import pytest
+from google.genai import types
+from pydantic import BaseModel, ValidationError
+
+from app.services.schemas import DecisionOutput, EwasteOutput, GuideOutput, QuestionsOutput, gemini_schema
+
+
+@pytest.mark.parametrize("schema", [DecisionOutput, EwasteOutput, GuideOutput, QuestionsOutput, list[str]])
+def test_schema_is_accepted_by_generate_content_config(schema):
+    config = types.GenerateContentConfig(response_mime_type="application/json", response_schema=gemini_schema(schema))
+    assert config.response_schema["type"] in ("OBJECT", "ARRAY")
+
+
+def test_nested_models_are_inlined():
+    pointers = gemini_schema(GuideOutput)["properties"]["pointers"]
+    assert pointers == {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {"heading": {"type": "STRING"}, "details": {"type": "STRING"}},
+            "required": ["heading", "details"],
+        },
+    }
+
+
+def test_decision_is_an_enum():
+    assert gemini_schema(DecisionOutput)["properties"]["decision"] == {"type": "STRING", "enum": ["resell", "recycle", "IGN"]}
+    assert DecisionOutput.model_validate_json('{"decision": "recycle"}').decision == "recycle"
+    with pytest.raises(ValidationError):
+        DecisionOutput.model_validate_json('{"decision": "Recycle."}')
+
+
+def test_generic_tag_is_limited_to_the_predefined_list():
+    enum = gemini_schema(EwasteOutput)["properties"]["generic_tag"]["enum"]
+    assert len(enum) == 13 and "Car Electronics" in enum and "IGN" in enum
+    item = {"category": "Laptop", "desc": "d", "search_tags": ["t"], "generic_tag": "Laptops"}
+    with pytest.raises(ValidationError):
+        EwasteOutput.model_validate(item)
+    assert EwasteOutput.model_validate({**item, "generic_tag": "Computers and Laptops"})
+
+
+def test_field_named_title_is_kept():
+    class Titled(BaseModel):
+        title: str
+        tags: List[str]
+
+    assert set(gemini_schema(Titled)["properties"]) == {"title", "tags"}